@@ -10,12 +10,22 @@ import json
 from collections import defaultdict
 import zipfile
 import tempfile
+import sys
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.term_dictionary import build_term_dictionary
+from common.segmented_index import SegmentedIndex, update_index_from_archive
+from tfidf_analysis.dedup import load_aliases
 
-def build_inverted_index(archive_path="../tokenization_lemmatization/lemmas.zip"):
+
+def build_inverted_index(archive_path="../tokenization_lemmatization/lemmas.zip",
+                         duplicates_file="../tfidf_analysis/duplicates.txt"):
 
     inverted_index = defaultdict(list)
 
+    # Почти-дубликаты (найденные на этапе tf-idf) в индекс не попадают
+    aliases = load_aliases(duplicates_file) if os.path.exists(duplicates_file) else {}
+
     # Создаем временную директорию для извлечения файлов из архива
     with tempfile.TemporaryDirectory() as temp_dir:
         print(f"Извлечение файлов из архива в временную директорию: {temp_dir}")
@@ -42,6 +52,10 @@ def build_inverted_index(archive_path="../tokenization_lemmatization/lemmas.zip"
                 print(f"Неверный формат имени файла: {token_file}. Файл пропущен.")
                 continue
 
+            if doc_id in aliases:
+                print(f"Документ {doc_id} — дубликат документа {aliases[doc_id]}. Файл пропущен.")
+                continue
+
             # Открываем файл для чтения с указанием кодировки UTF-8
             with open(os.path.join(lemmas_dir, token_file), "r", encoding="utf-8") as f:
                 # Читаем строки файла, разделяем их по символу ":" и берем только левую часть (лемму)
@@ -76,6 +90,28 @@ def save_inverted_index(inverted_index, output_file="inverted_index.json"):
         # Записываем закрывающую скобку JSON-объекта
         f.write('\n}')
 
+
+# Определяем функцию для сохранения индекса в компактный словарь терминов (читается через mmap)
+def save_term_dictionary(inverted_index, output_file="inverted_index.dict"):
+    # Для булева поиска IDF не нужен, поэтому записываем 0
+    build_term_dictionary(
+        ((key, 0.0, docs, None) for key, docs in inverted_index.items()),
+        output_file
+    )
+
+# Определяем функцию для дозаписи новых документов в сегментированный индекс
+def update_segments(archive_path="../tokenization_lemmatization/lemmas.zip",
+                    duplicates_file="../tfidf_analysis/duplicates.txt",
+                    index_dir="segments"):
+    # Документы читаются так же, как в build_inverted_index: леммы из lemmas.zip без дубликатов.
+    # Уже проиндексированные документы не перечитываются, а новые попадают в новый сегмент.
+    aliases = load_aliases(duplicates_file) if os.path.exists(duplicates_file) else {}
+    index = SegmentedIndex(index_dir)
+    added, removed = update_index_from_archive(index, archive_path, "lemmas", aliases)
+    index.maybe_merge()
+    print(f"Сегментированный индекс: добавлено {added}, удалено дубликатов {removed}")
+    return index
+
 # Точка входа в программу
 if __name__ == "__main__":
     # Строим инвертированный индекс
@@ -83,6 +119,8 @@ if __name__ == "__main__":
 
     # Сохраняем инвертированный индекс в файл
     save_inverted_index(inverted_index)
+    save_term_dictionary(inverted_index)
+    update_segments()
 
     # Выводим сообщение об успешном завершении
     print("Инвертированный индекс успешно сохранён")
\ No newline at end of file
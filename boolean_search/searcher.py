@@ -1,21 +1,44 @@
+import os
+import sys
 import json
 import re
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.term_dictionary import TermDictionary
+from common.segmented_index import SegmentedIndex
+
 # Определяем класс BooleanSearch, который реализует булев поиск по индексу документов.
 class BooleanSearch:
     def __init__(self, index_file="inverted_index.json"):
         # Конструктор класса. При инициализации загружается инвертированный индекс из файла.
         self.index = self.load_index(index_file)  # Загружаем индекс из файла.
-        self.all_docs = set()  # Создаем пустое множество для хранения всех документов.
-        # Проходим по всем значениям индекса (спискам документов для каждого слова).
-        for docs in self.index.values():
-            self.all_docs.update(docs)  # Добавляем все документы в множество self.all_docs.
+        if isinstance(self.index, (TermDictionary, SegmentedIndex)):
+            self.all_docs = self.index.all_docs()  # Все документы берём из индекса, не перебирая постинги.
+        else:
+            self.all_docs = set()  # Создаем пустое множество для хранения всех документов.
+            # Проходим по всем значениям индекса (спискам документов для каждого слова).
+            for docs in self.index.values():
+                self.all_docs.update(docs)  # Добавляем все документы в множество self.all_docs.
 
     def load_index(self, filename):
-        # Метод для загрузки инвертированного индекса из JSON-файла.
+        # Метод для загрузки инвертированного индекса: директория сегментов,
+        # компактный словарь (.dict) или JSON-файл.
+        if os.path.isdir(filename):
+            return SegmentedIndex(filename)  # Сегментированный индекс с дозаписью документов.
+        if filename.endswith(".dict"):
+            return TermDictionary(filename)  # Словарь терминов открывается через mmap.
         with open(filename, 'r', encoding='utf-8') as f:  # Открываем файл для чтения.
             return json.load(f)  # Загружаем данные из файла в формате JSON и возвращаем их.
 
+    def postings(self, token):
+        # Метод для получения списка документов, в которых встречается слово.
+        if isinstance(self.index, SegmentedIndex):
+            return self.index.postings(token)
+        if isinstance(self.index, TermDictionary):
+            term_id = self.index.get(token)
+            return self.index.postings(term_id) if term_id is not None else []
+        return self.index.get(token, [])
+
     def tokenize_query(self, query):
         # Метод для разбиения запроса на токены (слова, операторы и скобки).
         tokens = re.findall(r'\(|\)|AND|OR|NOT|\w+', query.upper())  # Используем регулярное выражение для поиска токенов.
@@ -82,7 +105,7 @@ class BooleanSearch:
             else:
                 # Если токен — слово, получаем соответствующее множество документов из индекса
                 # и добавляем его в стек.
-                stack.append(set(self.index.get(token, [])))
+                stack.append(set(self.postings(token)))
 
         # В конце в стеке должно остаться одно множество — результат запроса.
         return sorted(stack.pop()) if stack else []  # Возвращаем отсортированный список результатов.
@@ -93,8 +116,15 @@ class BooleanSearch:
         return doc_ids  # Возвращаем список идентификаторов документов.
 
 if __name__ == "__main__":
-    # Создаем экземпляр класса BooleanSearch, загружая индекс из файла "inverted_index.json".
-    searcher = BooleanSearch("inverted_index.json")
+    # Создаем экземпляр класса BooleanSearch, загружая сегментированный или компактный индекс,
+    # если он построен, иначе индекс из файла "inverted_index.json".
+    if os.path.isdir("segments"):
+        index_file = "segments"
+    elif os.path.exists("inverted_index.dict"):
+        index_file = "inverted_index.dict"
+    else:
+        index_file = "inverted_index.json"
+    searcher = BooleanSearch(index_file)
 
     # Запрашиваем у пользователя ввод запроса.
     query = name = input("Введите запрос: ")
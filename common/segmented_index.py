@@ -0,0 +1,565 @@
+import hashlib
+import json
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from collections import Counter, defaultdict
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.term_dictionary import TermDictionary, build_term_dictionary
+
+# Сегментированный индекс (в духе LSM-деревьев).
+#
+# Новые документы записываются в небольшие неизменяемые сегменты со своими постингами
+# и статистикой терминов, поэтому добавление не требует перестройки всего индекса.
+# Каждый сегмент — файл словаря терминов (TermDictionary): в поле IDF лежит документная
+# частота термина в сегменте, в весах — tf термина в документе. Сегменты открываются
+# через mmap, поэтому несколько процессов (воркеры uvicorn) делят одни и те же страницы.
+#
+# Глобальная документная частота термина — сумма частот по сегментам за вычетом
+# удалённых документов. Для каждого сегмента с удалёнными документами в памяти хранится
+# только счётчик: id термина -> сколько удалённых документов его содержат. Счётчик
+# меняется на величину удаления, а при слиянии исчезает вместе с сегментом.
+#
+# Удаление помечает документ «надгробием» (tombstone): он пропускается при поиске
+# и физически выбрасывается при слиянии сегментов.
+#
+# Оценка документов — косинус между вектором запроса и вектором tf-idf документа,
+# как у TFIDFVectorSearch. Длина вектора документа считается, когда сегмент записывается
+# или сливается, по статистике индекса на этот момент, и хранится вместе с сегментом.
+# Поэтому запрос не пересчитывает ничего по всему индексу, а оценки совпадают с матричным
+# поиском точно для документов, записанных или слитых после последнего изменения. Когда
+# число документов в индексе меняется больше чем в NORM_REFRESH_FACTOR раз по сравнению
+# с моментом записи сегмента, maybe_merge переписывает сегмент со свежими длинами.
+#
+# Файлы в директории индекса:
+#   manifest.json          — список живых сегментов, счётчик имён, надгробия
+#   seg_NNNNNN.dict        — постинги сегмента
+#   seg_NNNNNN.docs.json   — документы сегмента (длина вектора tf-idf и хеш содержимого)
+#                            и число документов индекса, по которому считались длины
+
+MERGE_FACTOR = 4  # Сколько сегментов одного уровня сливаются в один
+NORM_REFRESH_FACTOR = 2  # Во сколько раз должно измениться число документов, чтобы пересчитать длины
+
+
+def compute_idf(df, n_docs):
+    # Сглаженный IDF, как в tfidf_analysis/program.py
+    return math.log((n_docs + 1) / (df + 1)) + 1
+
+
+def content_hash(data):
+    # Хеш содержимого файла документа: по нему update_index узнаёт изменённые документы
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+class Segment:
+    def __init__(self, index_dir, name):
+        self.name = name
+        self.terms = TermDictionary(os.path.join(index_dir, f"{name}.dict"))
+        docs_file = os.path.join(index_dir, f"{name}.docs.json")
+        with open(docs_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or "docs" not in data:
+            raise ValueError(f"Неизвестный формат {docs_file}. Перестройте индекс.")
+        self.n_docs = data["n_docs"]  # Число документов индекса, по которому считались длины
+        docs = data["docs"]
+        # doc_id -> длина вектора tf-idf и хеш содержимого
+        self.norms = {int(doc_id): norm for doc_id, (norm, _) in docs.items()}
+        self.hashes = {int(doc_id): digest for doc_id, (_, digest) in docs.items()}
+        self.docs = set(self.norms)
+
+    def term_ids_of(self, doc_ids):
+        """
+        Id терминов сегмента, которые встречаются в указанных документах
+        (по одному на пару термин — документ). Постинги просматриваются в mmap без копирования.
+        """
+        offsets, postings, _ = self.terms.posting_arrays()
+        postings = np.frombuffer(postings, dtype=np.uint32)
+        positions = np.flatnonzero(np.isin(postings, np.fromiter(doc_ids, dtype=np.uint32)))
+        offsets = np.frombuffer(offsets, dtype=np.uint64)
+        return (np.searchsorted(offsets, positions.astype(np.uint64), side="right") - 1).tolist()
+
+
+def write_segment(index_dir, name, documents, idf, n_docs, hashes=None):
+    """
+    Записывает сегмент из словаря {doc_id: {термин: tf}}.
+    idf — функция термин -> IDF, по которой считаются длины векторов tf-idf документов,
+    n_docs — число документов индекса, для которого она посчитана.
+    """
+    hashes = hashes or {}
+    postings = defaultdict(list)
+    norms = {}
+    for doc_id in sorted(documents):
+        norm = 0.0
+        for term, tf in documents[doc_id].items():
+            postings[term].append((doc_id, tf))
+            norm += (tf * idf(term)) ** 2
+        norms[doc_id] = math.sqrt(norm)
+
+    build_term_dictionary(
+        (
+            (term, float(len(entries)), [doc_id for doc_id, _ in entries], [tf for _, tf in entries])
+            for term, entries in postings.items()
+        ),
+        os.path.join(index_dir, f"{name}.dict")
+    )
+    with open(os.path.join(index_dir, f"{name}.docs.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "n_docs": n_docs,
+            "docs": {doc_id: [norms[doc_id], hashes.get(doc_id)] for doc_id in sorted(documents)},
+        }, f)
+
+
+def compute_tf(tokens):
+    # TF как в tfidf_analysis/program.py: частота термина, делённая на длину документа
+    total = len(tokens)
+    counts = Counter(tokens)
+    return {term: count / total for term, count in counts.items()} if total else {}
+
+
+class Snapshot:
+    """
+    Согласованный снимок индекса: сегменты, надгробия и счётчики удалённых терминов,
+    взятые под одной блокировкой. Снимок не меняется, поэтому запрос читает его без блокировки.
+    """
+
+    def __init__(self, segments, tombstones, dead_terms):
+        self.segments = segments
+        self.tombstones = tombstones
+        self.dead_terms = dead_terms
+        self.n_docs = sum(len(segment.docs) - len(tombstones.get(segment.name, ())) for segment in segments)
+
+    def lookup(self, term):
+        """Документная частота термина по живым документам и пары (сегмент, id термина)."""
+        df = 0
+        hits = []
+        for segment in self.segments:
+            term_id = segment.terms.get(term)
+            if term_id is not None:
+                df += int(segment.terms.idf[term_id]) - self.dead_terms.get(segment.name, {}).get(term_id, 0)
+                hits.append((segment, term_id))
+        return df, hits
+
+    def idf_function(self, extra_df=None, extra_docs=0):
+        """
+        Функция термин -> IDF с кешем для записи сегмента. extra_df и extra_docs учитывают
+        документы, которые ещё только записываются.
+        """
+        extra_df = extra_df or {}
+        cache = {}
+
+        def idf(term):
+            if term not in cache:
+                df, _ = self.lookup(term)
+                cache[term] = compute_idf(df + extra_df.get(term, 0), self.n_docs + extra_docs)
+            return cache[term]
+
+        return idf
+
+
+class SegmentedIndex:
+    def __init__(self, index_dir="segments", merge_factor=MERGE_FACTOR):
+        self.index_dir = index_dir
+        self.manifest_file = os.path.join(index_dir, "manifest.json")
+        self.merge_factor = merge_factor
+        # Защищает список сегментов, надгробия и счётчики удалённых терминов. Они не
+        # изменяются на месте, а заменяются новыми (copy-on-write), поэтому ссылки, взятые
+        # под блокировкой, остаются согласованными и после её снятия.
+        self.lock = threading.RLock()
+        self.merge_lock = threading.Lock()  # Одновременно выполняется только одно слияние
+        self.merger = None
+        self.stop_merger = threading.Event()
+        os.makedirs(index_dir, exist_ok=True)
+
+        self.next_segment = 1
+        self.segments = []
+        self.tombstones = {}  # Имя сегмента -> множество удалённых из него документов
+        self.dead_terms = {}  # Имя сегмента -> {id термина: число удалённых документов с ним}
+        self.manifest_mtime = None
+        self.load_manifest()
+
+    def load_manifest(self):
+        """
+        Читает manifest.json. Уже открытые сегменты и их счётчики удалённых терминов
+        переиспользуются, открываются только новые сегменты.
+        """
+        with self.lock:
+            if not os.path.exists(self.manifest_file):
+                return
+            mtime = os.stat(self.manifest_file).st_mtime_ns
+            with open(self.manifest_file, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+
+            opened = {segment.name: segment for segment in self.segments}
+            segments = [opened.get(name) or Segment(self.index_dir, name) for name in manifest["segments"]]
+            tombstones = {name: frozenset(docs) for name, docs in manifest["tombstones"].items()}
+            dead_terms = {}
+            for segment in segments:
+                dead = tombstones.get(segment.name)
+                if not dead:
+                    continue
+                if self.tombstones.get(segment.name) == dead:
+                    dead_terms[segment.name] = self.dead_terms[segment.name]
+                else:
+                    dead_terms[segment.name] = Counter(segment.term_ids_of(dead))
+
+            self.next_segment = manifest["next_segment"]
+            self.segments, self.tombstones, self.dead_terms = segments, tombstones, dead_terms
+            self.manifest_mtime = mtime
+
+    def refresh(self):
+        """
+        Перечитывает manifest.json, если его изменил другой процесс (например, index_builder.py
+        при работающем демо). Проверка — один stat, её можно делать перед каждым запросом.
+        """
+        try:
+            if os.stat(self.manifest_file).st_mtime_ns == self.manifest_mtime:
+                return False
+            self.load_manifest()
+        except FileNotFoundError:
+            # Сегмент из манифеста уже слит и удалён: перечитаем при следующей проверке
+            return False
+        return True
+
+    def save_manifest(self):
+        manifest = {
+            "next_segment": self.next_segment,
+            "segments": [segment.name for segment in self.segments],
+            "tombstones": {name: sorted(docs) for name, docs in self.tombstones.items() if docs},
+        }
+        # Пишем во временный файл и переименовываем: манифест меняется атомарно
+        with open(self.manifest_file + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(self.manifest_file + ".tmp", self.manifest_file)
+        self.manifest_mtime = os.stat(self.manifest_file).st_mtime_ns
+
+    def new_segment_name(self):
+        with self.lock:
+            name = f"seg_{self.next_segment:06d}"
+            self.next_segment += 1
+            return name
+
+    def snapshot(self):
+        with self.lock:
+            return Snapshot(self.segments, self.tombstones, self.dead_terms)
+
+    def live_hashes(self):
+        """Хеши содержимого всех неудалённых документов: {doc_id: хеш}."""
+        with self.lock:
+            segments, tombstones = self.segments, self.tombstones
+        hashes = {}
+        for segment in segments:
+            dead = tombstones.get(segment.name, frozenset())
+            hashes.update((doc_id, digest) for doc_id, digest in segment.hashes.items() if doc_id not in dead)
+        return hashes
+
+    def live_docs(self):
+        """Множество всех неудалённых документов."""
+        return set(self.live_hashes())
+
+    def all_docs(self):
+        return self.live_docs()
+
+    def add_documents(self, documents, hashes=None):
+        """
+        Добавляет документы {doc_id: список токенов} новым сегментом.
+        hashes — хеши содержимого документов, по ним потом находятся изменённые.
+        Если документ уже есть в индексе, старая версия помечается удалённой.
+        """
+        if not documents:
+            return None
+        tfs = {doc_id: compute_tf(tokens) for doc_id, tokens in documents.items()}
+        snapshot = self.snapshot()
+        replaced = sum(
+            len((segment.docs & tfs.keys()) - snapshot.tombstones.get(segment.name, frozenset()))
+            for segment in snapshot.segments
+        )
+        extra_docs = len(tfs) - replaced
+        idf = snapshot.idf_function(Counter(term for tf in tfs.values() for term in tf), extra_docs)
+        name = self.new_segment_name()
+        write_segment(self.index_dir, name, tfs, idf, snapshot.n_docs + extra_docs, hashes)
+        segment = Segment(self.index_dir, name)
+
+        with self.lock:
+            self._delete(documents)
+            self.segments = self.segments + [segment]
+            self.save_manifest()
+        return name
+
+    def _delete(self, doc_ids):
+        doc_ids = set(doc_ids)
+        tombstones = dict(self.tombstones)
+        dead_terms = dict(self.dead_terms)
+        for segment in self.segments:
+            dead = (segment.docs & doc_ids) - tombstones.get(segment.name, frozenset())
+            if dead:
+                tombstones[segment.name] = tombstones.get(segment.name, frozenset()) | dead
+                # Документная частота уменьшается ровно на удалённые документы
+                counts = Counter(dead_terms.get(segment.name, {}))
+                counts.update(segment.term_ids_of(dead))
+                dead_terms[segment.name] = counts
+        self.tombstones, self.dead_terms = tombstones, dead_terms
+
+    def delete_documents(self, doc_ids):
+        """Помечает документы удалёнными; место освободится при слиянии."""
+        with self.lock:
+            self._delete(doc_ids)
+            self.save_manifest()
+
+    def delete_document(self, doc_id):
+        self.delete_documents([doc_id])
+
+    def postings(self, term):
+        """Документы, содержащие термин, по всем живым сегментам."""
+        with self.lock:
+            segments, tombstones = self.segments, self.tombstones
+        docs = []
+        for segment in segments:
+            term_id = segment.terms.get(term)
+            if term_id is not None:
+                dead = tombstones.get(segment.name, frozenset())
+                docs.extend(doc_id for doc_id in segment.terms.postings(term_id) if doc_id not in dead)
+        return docs
+
+    def search(self, query, top_k=5):
+        """
+        Ищет по всем сегментам и возвращает топ-k документов по косинусному сходству
+        векторов tf-idf запроса и документа, как TFIDFVectorSearch.
+        """
+        snapshot = self.snapshot()
+
+        term_counts = Counter(query.lower().split())
+        if not term_counts:
+            return []
+        max_tf = max(term_counts.values())
+
+        # Вектор запроса: сглаженный TF, умноженный на IDF; термины не из индекса пропускаются
+        query_terms = []
+        for term, count in term_counts.items():
+            df, hits = snapshot.lookup(term)
+            if df > 0:
+                idf = compute_idf(df, snapshot.n_docs)
+                query_terms.append(((0.5 + 0.5 * count / max_tf) * idf, idf, hits))
+        if not query_terms:
+            return []
+        query_norm = math.sqrt(sum(weight * weight for weight, _, _ in query_terms))
+
+        scores = defaultdict(float)
+        norms = {}
+        for weight, idf, hits in query_terms:
+            for segment, term_id in hits:
+                dead = snapshot.tombstones.get(segment.name, frozenset())
+                for doc_id, tf in zip(segment.terms.postings(term_id), segment.terms.weights(term_id)):
+                    if doc_id not in dead:
+                        scores[doc_id] += weight * tf * idf
+                        norms[doc_id] = segment.norms[doc_id]
+
+        ranked = sorted(
+            ((doc_id, score / (query_norm * (norms[doc_id] or 1))) for doc_id, score in scores.items()),
+            key=lambda item: item[1], reverse=True
+        )[:top_k]
+        return [{"doc_id": doc_id, "score": score} for doc_id, score in ranked]
+
+    def merge_candidates(self):
+        """
+        Выбирает сегменты для слияния: уровень сегмента — порядок его размера по основанию
+        merge_factor. Как только на одном уровне набирается merge_factor сегментов, они сливаются.
+        """
+        with self.lock:
+            segments = self.segments
+        tiers = defaultdict(list)
+        for segment in segments:
+            size, tier = len(segment.docs), 0
+            while size >= self.merge_factor:
+                size //= self.merge_factor
+                tier += 1
+            tiers[tier].append(segment)
+        for tier in sorted(tiers):
+            if len(tiers[tier]) >= self.merge_factor:
+                return tiers[tier][:self.merge_factor]
+        return []
+
+    def stale_segment(self):
+        """
+        Сегмент, длины векторов которого считались при числе документов, отличающемся
+        от текущего больше чем в NORM_REFRESH_FACTOR раз, или None.
+        """
+        snapshot = self.snapshot()
+        for segment in snapshot.segments:
+            low, high = sorted((max(segment.n_docs, 1), max(snapshot.n_docs, 1)))
+            if high > low * NORM_REFRESH_FACTOR:
+                return segment
+        return None
+
+    def merge(self, segments):
+        """
+        Сливает сегменты в один, выбрасывая удалённые документы. Длины векторов
+        слитых документов пересчитываются по текущей статистике индекса.
+        """
+        snapshot = self.snapshot()
+        tombstones = {segment.name: snapshot.tombstones.get(segment.name, frozenset()) for segment in segments}
+
+        # Документы без терминов тоже переносим, чтобы они не пропали из индекса
+        documents = {
+            doc_id: {} for segment in segments for doc_id in segment.docs - tombstones[segment.name]
+        }
+        hashes = {}
+        for segment in segments:
+            for term_id, term in enumerate(segment.terms):
+                for doc_id, tf in zip(segment.terms.postings(term_id), segment.terms.weights(term_id)):
+                    if doc_id not in tombstones[segment.name]:
+                        documents[doc_id][term] = tf
+            hashes.update((doc_id, segment.hashes[doc_id]) for doc_id in segment.docs - tombstones[segment.name])
+
+        name = self.new_segment_name()
+        write_segment(self.index_dir, name, documents, snapshot.idf_function(), snapshot.n_docs, hashes)
+        merged = Segment(self.index_dir, name)
+
+        with self.lock:
+            names = {segment.name for segment in segments}
+            new_segments = [segment for segment in self.segments if segment.name not in names]
+            new_segments.insert(self.segments.index(segments[0]), merged)
+            tombstones_now = {n: docs for n, docs in self.tombstones.items() if n not in names}
+            dead_terms = {n: counts for n, counts in self.dead_terms.items() if n not in names}
+
+            # Документы, удалённые из сливаемых сегментов во время слияния, удаляем и из нового
+            late = frozenset().union(*(self.tombstones.get(n, frozenset()) - tombstones[n] for n in names))
+            if late:
+                tombstones_now[name] = late
+                dead_terms[name] = Counter(merged.term_ids_of(late))
+
+            # Сегменты, надгробия и счётчики подменяются вместе, поэтому запрос видит либо
+            # старый, либо новый набор, но не их смесь
+            self.segments, self.tombstones, self.dead_terms = new_segments, tombstones_now, dead_terms
+            self.save_manifest()
+
+        # Старые файлы можно удалять: открытые mmap остаются валидными до закрытия
+        for segment in segments:
+            os.remove(os.path.join(self.index_dir, f"{segment.name}.dict"))
+            os.remove(os.path.join(self.index_dir, f"{segment.name}.docs.json"))
+        return name
+
+    def maybe_merge(self):
+        """
+        Выполняет слияния, пока политика находит подходящие сегменты, затем переписывает
+        сегменты с устаревшими длинами векторов.
+        """
+        merged = []
+        with self.merge_lock:
+            while True:
+                candidates = self.merge_candidates()
+                if not candidates:
+                    break
+                merged.append(self.merge(candidates))
+            while True:
+                segment = self.stale_segment()
+                if segment is None:
+                    return merged
+                merged.append(self.merge([segment]))
+
+    def start_background_merger(self, interval=1.0):
+        """Запускает фоновый поток, который периодически сливает мелкие сегменты."""
+        def run():
+            while not self.stop_merger.wait(interval):
+                self.maybe_merge()
+
+        self.stop_merger.clear()
+        self.merger = threading.Thread(target=run, name="segment-merger", daemon=True)
+        self.merger.start()
+
+    def stop_background_merger(self):
+        if self.merger is not None:
+            self.stop_merger.set()
+            self.merger.join()
+            self.merger = None
+
+
+def read_tokens(path):
+    # Как в tfidf_analysis/program.py: токены через пробел
+    with open(path, "r", encoding="utf-8") as f:
+        return [word.strip().lower() for word in f.read().split() if word.strip()]
+
+
+def read_lemmas(path):
+    # Как в boolean_search/index_builder.py: строки "лемма: формы", берём только лемму
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip().split(":")[0] for line in f if line.strip()]
+
+
+READERS = {"tokens": read_tokens, "lemmas": read_lemmas}
+
+
+def update_index(index, source_dir, kind="tokens", aliases=None):
+    """
+    Дозаписывает в индекс документы из файлов {kind}_N.txt (kind — "tokens" или "lemmas").
+    Документы, содержимое которых не изменилось (по хешу), пропускаются; изменённые
+    добавляются заново, а старая версия помечается удалённой. Почти-дубликаты из duplicates.txt
+    (aliases — {дубликат: канонический документ}) не добавляются, а добавленные ранее удаляются.
+    Возвращает число добавленных (новых и изменённых) и число удалённых документов.
+    """
+    aliases = aliases or {}
+    reader = READERS[kind]
+    indexed = index.live_hashes()
+
+    documents = {}
+    hashes = {}
+    for filename in os.listdir(source_dir):
+        if not filename.startswith(f"{kind}_") or not filename.endswith(".txt"):
+            continue
+        try:
+            doc_id = int(filename[len(kind) + 1:-len(".txt")])
+        except ValueError:
+            print(f"Неверный формат имени файла: {filename}. Файл пропущен.")
+            continue
+        if doc_id in aliases:
+            continue
+        path = os.path.join(source_dir, filename)
+        with open(path, "rb") as f:
+            digest = content_hash(f.read())
+        if indexed.get(doc_id) != digest:
+            documents[doc_id] = reader(path)
+            hashes[doc_id] = digest
+
+    removed = sorted(doc_id for doc_id in indexed if doc_id in aliases)
+    if removed:
+        index.delete_documents(removed)
+    index.add_documents(documents, hashes)
+    return len(documents), len(removed)
+
+
+def update_index_from_archive(index, archive_path, kind="tokens", aliases=None):
+    """То же, что update_index, для архива tokens.zip или lemmas.zip (файлы лежат в папке kind/)."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        with zipfile.ZipFile(archive_path, "r") as zip_ref:
+            zip_ref.extractall(temp_dir)
+        return update_index(index, os.path.join(temp_dir, kind), kind, aliases)
+
+
+if __name__ == "__main__":
+    # Добавляет в индекс новые и изменённые документы (остальные пропускаются):
+    # python common/segmented_index.py segments tokenization_lemmatization/tokens [tokens|lemmas] [duplicates.txt]
+    from tfidf_analysis.dedup import load_aliases
+
+    index_dir = sys.argv[1] if len(sys.argv) > 1 else "segments"
+    source_dir = sys.argv[2] if len(sys.argv) > 2 else "tokenization_lemmatization/tokens"
+    kind = sys.argv[3] if len(sys.argv) > 3 else "tokens"
+    duplicates_file = sys.argv[4] if len(sys.argv) > 4 else "tfidf_analysis/duplicates.txt"
+    aliases = load_aliases(duplicates_file) if os.path.exists(duplicates_file) else {}
+
+    index = SegmentedIndex(index_dir)
+    start = time.perf_counter()
+    added, removed = update_index(index, source_dir, kind, aliases)
+    print(f"Добавлено документов: {added}, удалено дубликатов: {removed} "
+          f"за {time.perf_counter() - start:.3f} с")
+
+    start = time.perf_counter()
+    merged = index.maybe_merge()
+    if merged:
+        print(f"Слияние в {', '.join(merged)} за {time.perf_counter() - start:.3f} с")
+    print(f"Сегментов: {len(index.segments)}, документов: {len(index.live_docs())}")
@@ -0,0 +1,304 @@
+import json
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+import tracemalloc
+from array import array
+from bisect import bisect_right
+
+# Компактный словарь терминов: термин -> id, IDF и списки документов.
+#
+# Термины отсортированы и хранятся блоками с префиксным сжатием (front coding):
+# первый термин блока записан целиком, остальные — как длина общего с предыдущим
+# префикса и оставшийся суффикс. IDF, смещения постингов, номера документов и веса
+# лежат в параллельных типизированных массивах. Файл читается через mmap, в памяти
+# процесса держатся только первые термины блоков.
+#
+# Формат файла (little-endian, секции выровнены по 8 байт):
+#   заголовок        — MAGIC, версия, размер блока, число терминов, число постингов,
+#                      смещения секций
+#   блоки            — uint64[число блоков], смещения блоков внутри секции терминов
+#   idf              — float64[число терминов]
+#   смещения         — uint64[число терминов + 1], начало постингов каждого термина
+#   документы        — uint32[число постингов]
+#   веса             — float32[число постингов]
+#   термины          — блоки с префиксным сжатием (длины записаны как varint)
+
+MAGIC = b"TDC1"
+VERSION = 1
+HEADER = struct.Struct("<4sHHQQQQQQQQ")
+
+
+def encode_varint(value, out):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varint(buf, pos):
+    result = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def common_prefix(a, b):
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def build_term_dictionary(entries, output_file, block_size=8):
+    """
+    Сохраняет словарь терминов в файл.
+    entries — итерируемый набор (термин, idf, [doc_id, ...], [вес, ...] или None).
+    Возвращает число терминов.
+    """
+    entries = sorted(entries, key=lambda entry: entry[0].encode("utf-8"))
+
+    idf = array("d")
+    offsets = array("Q", [0])
+    docs = array("I")
+    weights = array("f")
+    block_offsets = array("Q")
+    blob = bytearray()
+
+    previous = b""
+    for i, (term, term_idf, doc_ids, doc_weights) in enumerate(entries):
+        data = term.encode("utf-8")
+        if i % block_size == 0:
+            block_offsets.append(len(blob))
+            encode_varint(len(data), blob)
+            blob += data
+        else:
+            prefix = common_prefix(previous, data)
+            encode_varint(prefix, blob)
+            encode_varint(len(data) - prefix, blob)
+            blob += data[prefix:]
+        previous = data
+
+        idf.append(term_idf)
+        docs.extend(doc_ids)
+        weights.extend(doc_weights if doc_weights is not None else [0.0] * len(doc_ids))
+        offsets.append(len(docs))
+
+    sections = [block_offsets, idf, offsets, docs, weights, blob]
+    positions = []
+    pos = HEADER.size
+    for section in sections:
+        pos += -pos % 8
+        positions.append(pos)
+        pos += len(section) * (section.itemsize if isinstance(section, array) else 1)
+
+    with open(output_file, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, block_size, len(entries), len(docs), *positions))
+        for position, section in zip(positions, sections):
+            f.write(b"\0" * (position - f.tell()))
+            f.write(section.tobytes() if isinstance(section, array) else bytes(section))
+
+    return len(entries)
+
+
+class TermDictionary:
+    """
+    Словарь терминов, открытый через mmap. Ведёт себя как отображение термин -> id
+    (get, in, [], len, итерация по терминам в отсортированном порядке).
+    """
+
+    def __init__(self, filename):
+        self._file = open(filename, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mm)
+
+        (magic, version, self.block_size, self.n_terms, n_postings,
+         blocks_pos, idf_pos, offsets_pos, docs_pos, weights_pos, terms_pos) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Неизвестный формат словаря терминов: {filename}")
+
+        n_blocks = (self.n_terms + self.block_size - 1) // self.block_size
+        self._blocks = view[blocks_pos:blocks_pos + 8 * n_blocks].cast("Q")
+        self.idf = view[idf_pos:idf_pos + 8 * self.n_terms].cast("d")
+        self._offsets = view[offsets_pos:offsets_pos + 8 * (self.n_terms + 1)].cast("Q")
+        self._docs = view[docs_pos:docs_pos + 4 * n_postings].cast("I")
+        self._weights = view[weights_pos:weights_pos + 4 * n_postings].cast("f")
+        self._terms_pos = terms_pos
+
+        # Первые термины блоков держим в памяти: двоичный поиск по ним идёт на уровне C,
+        # а из mmap декодируется только один блок.
+        self._heads = [self._read_head(b) for b in range(n_blocks)]
+
+    def close(self):
+        for view in (self._blocks, self.idf, self._offsets, self._docs, self._weights):
+            view.release()
+        self._mm.close()
+        self._file.close()
+
+    def _read_head(self, block):
+        pos = self._terms_pos + self._blocks[block]
+        length, pos = decode_varint(self._mm, pos)
+        return self._mm[pos:pos + length]
+
+    def _read_block(self, block):
+        """Читает сжатый блок из mmap одним куском."""
+        start = self._terms_pos + self._blocks[block]
+        if block + 1 < len(self._blocks):
+            end = self._terms_pos + self._blocks[block + 1]
+        else:
+            end = len(self._mm)
+        return self._mm[start:end]
+
+    def _scan_block(self, block):
+        """Последовательно декодирует термины блока (в байтах)."""
+        buf = self._read_block(block)
+        length, pos = decode_varint(buf, 0)
+        current = buf[pos:pos + length]
+        pos += length
+        yield current
+
+        count = min(self.block_size, self.n_terms - block * self.block_size)
+        for _ in range(count - 1):
+            prefix, pos = decode_varint(buf, pos)
+            length, pos = decode_varint(buf, pos)
+            current = current[:prefix] + buf[pos:pos + length]
+            pos += length
+            yield current
+
+    def get(self, term, default=None):
+        """Возвращает id термина или default, если термина нет."""
+        data = term.encode("utf-8")
+        block = bisect_right(self._heads, data) - 1
+        if block < 0:
+            return default
+        if self._heads[block] == data:
+            return block * self.block_size
+
+        # Сканируем блок без генератора: это самый горячий путь поиска.
+        # Префикс и длина суффикса почти всегда меньше 128 и занимают по одному байту.
+        buf = self._read_block(block)
+        length, pos = decode_varint(buf, 0)
+        current = buf[pos:pos + length]
+        pos += length
+        count = min(self.block_size, self.n_terms - block * self.block_size)
+        for i in range(1, count):
+            prefix = buf[pos]
+            if prefix < 0x80:
+                pos += 1
+            else:
+                prefix, pos = decode_varint(buf, pos)
+            length = buf[pos]
+            if length < 0x80:
+                pos += 1
+            else:
+                length, pos = decode_varint(buf, pos)
+            current = current[:prefix] + buf[pos:pos + length]
+            pos += length
+            if current == data:
+                return block * self.block_size + i
+            if current > data:
+                break
+        return default
+
+    def __getitem__(self, term):
+        term_id = self.get(term)
+        if term_id is None:
+            raise KeyError(term)
+        return term_id
+
+    def __contains__(self, term):
+        return self.get(term) is not None
+
+    def __len__(self):
+        return self.n_terms
+
+    def __iter__(self):
+        for block in range(len(self._heads)):
+            for data in self._scan_block(block):
+                yield data.decode("utf-8")
+
+    def term(self, term_id):
+        """Возвращает термин по его id."""
+        block, index = divmod(term_id, self.block_size)
+        for i, data in enumerate(self._scan_block(block)):
+            if i == index:
+                return data.decode("utf-8")
+        raise IndexError(term_id)
+
+    def postings(self, term_id):
+        """Номера документов, в которых встречается термин."""
+        return self._docs[self._offsets[term_id]:self._offsets[term_id + 1]].tolist()
+
+    def weights(self, term_id):
+        """Веса термина в документах (в том же порядке, что и postings)."""
+        return self._weights[self._offsets[term_id]:self._offsets[term_id + 1]].tolist()
+
+    def posting_arrays(self):
+        """Смещения постингов, номера документов и веса целиком — без копирования из mmap."""
+        return self._offsets, self._docs, self._weights
+
+    def all_docs(self):
+        """Множество всех документов, встречающихся в словаре."""
+        return set(self._docs.tolist())
+
+
+def benchmark(index_file, lookups=100000):
+    """
+    Сравнивает словарь терминов с обычными dict (term_to_id + idf_dict) на словаре
+    из JSON-индекса: байты на термин и время поиска термина.
+    """
+    with open(index_file, "r", encoding="utf-8") as f:
+        text = f.read()
+    terms = list(json.loads(text).keys())
+    sample = [random.choice(terms) for _ in range(lookups)]
+
+    # Память dict-подхода: свои строки-ключи, term_to_id и idf_dict, как в TFIDFVectorSearch
+    tracemalloc.start()
+    keys = [term.encode("utf-8").decode("utf-8") for term in terms]
+    term_to_id = {term: i for i, term in enumerate(keys)}
+    idf_dict = {term: 1.0 + i / len(keys) for i, term in enumerate(keys)}
+    del keys
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    dict_file = index_file + ".bench.dict"
+    build_term_dictionary(((term, idf_dict[term], [], None) for term in terms), dict_file)
+
+    tracemalloc.start()
+    dictionary = TermDictionary(dict_file)
+    heap_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    file_bytes = os.path.getsize(dict_file)
+
+    start = time.perf_counter()
+    for term in sample:
+        term_to_id.get(term)
+    dict_ns = (time.perf_counter() - start) / lookups * 1e9
+
+    start = time.perf_counter()
+    for term in sample:
+        dictionary.get(term)
+    compact_ns = (time.perf_counter() - start) / lookups * 1e9
+
+    assert all(dictionary.term(dictionary[term]) == term for term in sample[:1000])
+    dictionary.close()
+    os.remove(dict_file)
+
+    n = len(terms)
+    print(f"Терминов: {n}")
+    print(f"dict (term_to_id + idf_dict): {dict_bytes / n:.1f} байт/термин в куче, поиск {dict_ns:.0f} нс")
+    print(f"TermDictionary: файл {file_bytes / n:.1f} байт/термин, в куче {heap_bytes / n:.1f} байт/термин, "
+          f"поиск {compact_ns:.0f} нс")
+
+
+if __name__ == "__main__":
+    # python common/term_dictionary.py t_5_search/inverted_index.json
+    benchmark(sys.argv[1] if len(sys.argv) > 1 else "t_5_search/inverted_index.json")
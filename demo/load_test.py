@@ -0,0 +1,94 @@
+import argparse
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+# Простой генератор нагрузки для веб-интерфейса поиска.
+# Отправляет POST-запросы из нескольких потоков и печатает пропускную способность
+# и перцентили задержки.
+#
+# Замеры на 1 CPU, индекс из 100 документов (uvicorn demo.main:app):
+#   до SearchExecutor и mmap-матрицы, 1 процесс, --concurrency 16 --requests 16:
+#       0.2 req/s, p50 34143 мс, p95 79288 мс, p99 88514 мс
+#       (каждый запрос заново строил и сохранял индекс)
+#   после, 1 процесс, --concurrency 16 --requests 800:   218.6 req/s, p50 72 мс,  p95 98 мс,  p99 114 мс
+#   после, 1 процесс, --concurrency 64 --requests 1280:  416.4 req/s, p50 141 мс, p95 219 мс, p99 256 мс
+#   после, 4 процесса, --concurrency 64 --requests 1280: 200.6 req/s, p50 285 мс, p95 558 мс, p99 691 мс
+#       (на одном ядре процессы конкурируют за CPU, и одинаковые запросы в разных
+#       процессах не объединяются; матрица общая — ~58 МБ Shared_Clean на процесс)
+#   сегментированный индекс t_5_search/segments (61 документ без дубликатов):
+#   1 процесс, --concurrency 16 --requests 800:   559.4 req/s, p50 26 мс,  p95 42 мс,  p99 48 мс
+#   1 процесс, --concurrency 64 --requests 1280:  703.4 req/s, p50 85 мс,  p95 144 мс, p99 163 мс
+#   4 процесса, --concurrency 64 --requests 1280: 523.6 req/s, p50 102 мс, p95 212 мс, p99 296 мс
+#       (словари сегментов открыты через mmap и общие для процессов, в куче каждого процесса
+#       только длины векторов и хеши документов)
+
+DEFAULT_QUERIES = [
+    "собака", "щенок", "корм", "порода собак", "здоровье собаки",
+    "прививки щенку", "уход за шерстью", "дрессировка", "ветеринар", "питание",
+]
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def worker(url, queries, count, latencies, statuses, lock):
+    for _ in range(count):
+        data = urllib.parse.urlencode({"query": random.choice(queries)}).encode("utf-8")
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(url, data=data) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except urllib.error.URLError:
+            status = 0
+        elapsed = time.perf_counter() - start
+
+        with lock:
+            latencies.append(elapsed)
+            statuses[status] = statuses.get(status, 0) + 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест поиска")
+    parser.add_argument("--url", default="http://127.0.0.1:8000/")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--queries", nargs="*", default=DEFAULT_QUERIES)
+    args = parser.parse_args()
+
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    per_thread = max(1, args.requests // args.concurrency)
+
+    threads = [
+        threading.Thread(target=worker, args=(args.url, args.queries, per_thread, latencies, statuses, lock))
+        for _ in range(args.concurrency)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total = time.perf_counter() - start
+
+    print(f"Запросов: {len(latencies)} за {total:.2f} с, потоков: {args.concurrency}")
+    print(f"Пропускная способность: {len(latencies) / total:.1f} запросов/с")
+    for p in (50, 95, 99):
+        print(f"p{p}: {percentile(latencies, p) * 1000:.1f} мс")
+    print(f"Коды ответов: {dict(sorted(statuses.items()))}")
+
+
+if __name__ == "__main__":
+    main()
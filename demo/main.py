@@ -5,11 +5,17 @@ import os
 import uvicorn
 
 from t_5_search.searcher import TFIDFVectorSearch
+from tokenization_lemmatization.forward_store import ForwardStore, STORE_FILE
+from demo.search_executor import SearchExecutor, SearchOverloaded
 
 app = FastAPI()
 templates = Jinja2Templates(directory="templates")
 searchers = TFIDFVectorSearch(data_dir="output_terms")
-inverted_index = searchers.load_index()
+# Индекс загружается один раз при старте. Если построен сегментированный индекс, поиск
+# идёт по нему (новые документы попадают туда без перестройки); иначе — по матрице векторов,
+# которая открывается через mmap, поэтому воркеры uvicorn делят одну копию в памяти.
+if not searchers.load_segments():
+    searchers.load_index()
 
 index_map = {}
 file = os.path.join(os.getcwd(), "index.txt")
@@ -19,6 +25,39 @@ with open(file, "r", encoding="utf-8") as f:
         num = int(filename.replace(".html", ""))
         index_map[num] = url
 
+# Прямой индекс с текстами документов для сниппетов (если он построен)
+forward_store = None
+if os.path.exists(STORE_FILE):
+    forward_store = ForwardStore(STORE_FILE)
+else:
+    print(f"Прямой индекс {STORE_FILE} не найден, результаты будут без сниппетов. "
+          f"Запустите tokenization_lemmatization/program.py, чтобы его построить.")
+
+
+def run_search(query, top_k):
+    """Поиск и построение сниппетов; выполняется в пуле потоков, а не в цикле событий."""
+    results = searchers.search(query, top_k=top_k)
+    top_ids = [doc_data["doc_id"] for doc_data in results[:top_k]]
+    return [
+        {
+            "url": index_map[doc_id],
+            "snippet": forward_store.snippet(doc_id, query) if forward_store else ""
+        }
+        for doc_id in top_ids if doc_id in index_map
+    ]
+
+
+search_executor = SearchExecutor(
+    run_search,
+    max_workers=int(os.environ.get("SEARCH_WORKERS", 4)),
+    max_queue=int(os.environ.get("SEARCH_QUEUE", 32))
+)
+
+
+@app.on_event("shutdown")
+def shutdown_executor():
+    search_executor.shutdown()
+
 @app.get("/", response_class=HTMLResponse)
 async def read_form(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
@@ -33,19 +72,25 @@ async def handle_query(request: Request, query: str = Form(...)):
             "results": [],
             "error": "Пустой запрос. Пожалуйста, введите текст."
         })
-    searchers.load_data()
-    searchers.save_index()
-    results = searchers.search(query, top_k=10)
-    top_ids = [doc_data["doc_id"] for doc_data in results[:10]]
+    try:
+        results = await search_executor.search(query, top_k=10)
+    except SearchOverloaded:
+        return templates.TemplateResponse("index.html", {
+            "request": request,
+            "query": query,
+            "results": [],
+            "error": "Сервер перегружен. Попробуйте повторить запрос позже."
+        }, status_code=503)
 
-    urls = [index_map.get(doc_id) for doc_id in top_ids if doc_id in index_map]
     return templates.TemplateResponse("index.html", {
         "request": request,
         "query": query,
-        "results": urls
+        "results": results
     })
 
 
 if __name__ == "__main__":
     uvicorn.run("demo.main:app", host="127.0.0.1", port=8000, reload=True)
     # uvicorn demo.main:app --reload
+    # Несколько воркеров с общим индексом: uvicorn demo.main:app --workers 4
+    # Нагрузочный тест: python demo/load_test.py --concurrency 32 --requests 2000
@@ -0,0 +1,51 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+class SearchOverloaded(Exception):
+    """Очередь поиска переполнена, запрос нужно отклонить."""
+
+
+class SearchExecutor:
+    """
+    Выполняет CPU-зависимый поиск в ограниченном пуле потоков, не блокируя цикл событий.
+
+    - одновременно считается не больше max_workers запросов, остальные ждут в очереди;
+    - если ожидающих и выполняющихся вычислений уже max_queue, новый запрос
+      отклоняется (SearchOverloaded);
+    - одинаковые запросы, пришедшие одновременно, объединяются в одно вычисление,
+      результат которого получают все ожидающие.
+    """
+
+    def __init__(self, search_func, max_workers=4, max_queue=32):
+        self.search_func = search_func  # Функция (query, top_k) -> результаты.
+        self.max_queue = max_queue
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="search")
+        self.in_flight = {}  # (запрос, top_k) -> Future выполняющегося вычисления.
+
+    def pending(self):
+        """Число различных вычислений, ожидающих или выполняющихся в пуле."""
+        return len(self.in_flight)
+
+    async def search(self, query, top_k=10):
+        # Нормализуем запрос так же, как поиск: регистр и лишние пробелы не влияют на результат
+        query = " ".join(query.lower().split())
+        key = (query, top_k)
+
+        future = self.in_flight.get(key)
+        if future is None:
+            if len(self.in_flight) >= self.max_queue:
+                raise SearchOverloaded(f"В очереди уже {len(self.in_flight)} запросов")
+
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.pool, self.search_func, query, top_k)
+            self.in_flight[key] = future
+            # Убираем запрос из списка выполняющихся сразу по завершении,
+            # чтобы следующие запросы видели свежий результат, а не ждали старый.
+            future.add_done_callback(lambda _: self.in_flight.pop(key, None))
+
+        # shield: отмена одного ожидающего (клиент отключился) не отменяет общее вычисление
+        return await asyncio.shield(future)
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
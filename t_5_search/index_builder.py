@@ -1,12 +1,19 @@
 ﻿import os
+import sys
 from collections import defaultdict
 import json
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.term_dictionary import build_term_dictionary
+from common.segmented_index import SegmentedIndex, update_index_from_archive
+from tfidf_analysis.dedup import load_aliases
+
 FILES_DIR = "./documents"
 
 # Инициализация структур
 inverted_index = defaultdict(list)  # { слово: [ {"document": doc_id, "tf": tf}, ... ] }
 idf_dict = {}  # { слово: idf }
+tfidf_weights = defaultdict(list)  # { слово: [tf-idf, ...] } в том же порядке, что и документы в inverted_index
 
 # Определяем функцию для сохранения инвертированного индекса в файл JSON
 def save_inverted_index(inverted_index, output_file="inverted_index.json"):
@@ -41,15 +48,17 @@ for filename in os.listdir(FILES_DIR):
             if not line:
                 continue
 
-            # Разбиваем строку на слово, tf, idf
+            # Разбиваем строку на слово, idf, tf-idf (порядок столбцов tfidf_analysis/program.py)
             parts = line.split()
             if len(parts) != 3:
                 continue  # Пропускаем некорректные строки
 
-            word, tf, idf = parts[0], float(parts[1]), float(parts[2])
+            word, idf, tfidf = parts[0], float(parts[1]), float(parts[2])
+            tf = round(tfidf / idf, 6) if idf else 0.0
 
             # Добавляем в обратный индекс в виде объекта
             inverted_index[word].append({"document": doc_id, "tf": tf})
+            tfidf_weights[word].append(tfidf)
 
             # Обновляем IDF (если слово уже встречалось, проверяем, что значение то же)
             if word in idf_dict:
@@ -70,4 +79,23 @@ for word, idf in list(idf_dict.items())[:5]:
 save_inverted_index(inverted_index)
 
 with open("idf_dict.json", "w", encoding="utf-8") as f:
-    json.dump(idf_dict, f, ensure_ascii=False, indent=2)
\ No newline at end of file
+    json.dump(idf_dict, f, ensure_ascii=False, indent=2)
+
+# Компактный словарь терминов: IDF, документы и tf-idf в параллельных массивах, читается через mmap
+build_term_dictionary(
+    (
+        (word, idf_dict[word], [e["document"] for e in entries], tfidf_weights[word])
+        for word, entries in inverted_index.items()
+    ),
+    "inverted_index.dict"
+)
+
+# Сегментированный индекс для векторного поиска: дописываем только новые документы
+# из токенов, почти-дубликаты (их находит tfidf_analysis/program.py) пропускаем
+duplicates_file = "../tfidf_analysis/duplicates.txt"
+aliases = load_aliases(duplicates_file) if os.path.exists(duplicates_file) else {}
+segments = SegmentedIndex("segments")
+added, removed = update_index_from_archive(segments, "../tokenization_lemmatization/tokens.zip", "tokens", aliases)
+segments.maybe_merge()
+print(f"Сегментированный индекс: добавлено {added}, удалено дубликатов {removed}, "
+      f"сегментов {len(segments.segments)}")
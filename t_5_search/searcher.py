@@ -1,16 +1,23 @@
 ﻿import os
+import sys
 import json
 import numpy as np
 from collections import defaultdict
 from sklearn.metrics.pairwise import cosine_similarity
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.term_dictionary import TermDictionary, build_term_dictionary
+from common.segmented_index import SegmentedIndex
+
 
 class TFIDFVectorSearch:
     def __init__(self, data_dir="output_terms"):
         self.data_dir = data_dir  # Путь к директории с данными TF-IDF.
-        self.term_to_id = {}  # Словарь для отображения терминов в их уникальные индексы.
-        self.idf_dict = {}  # Словарь для хранения IDF (inverse document frequency) каждого термина.
+        self.term_to_id = {}  # Отображение терминов в их индексы (после load_index — TermDictionary).
+        self.idf = []  # IDF (inverse document frequency) каждого термина по его индексу.
         self.doc_data = []  # Список, где каждый элемент — это словарь с ID документа и его вектором.
+        self.doc_matrix = None  # Матрица векторов документов (строится один раз или читается через mmap).
+        self.segments = None  # Сегментированный индекс; если он загружен, поиск идёт по нему.
 
     def load_data(self):
         self.data_dir = os.path.join(os.path.join(os.path.dirname(os.getcwd()), "t_5_search"), self.data_dir)
@@ -19,23 +26,29 @@ class TFIDFVectorSearch:
         # Фильтрует файлы, начинающиеся с "tfidf_terms_", чтобы загрузить только нужные.
 
         # Сначала собираем все термины и их IDF
+        term_idf = {}
         for filename in filenames:
             with open(os.path.join(self.data_dir, filename), 'r', encoding='utf-8') as f:
                 for line in f:
                     term, idf, _ = line.strip().split()
                     # Разбиваем строку файла на термин, IDF и игнорируем третье значение.
-                    if term not in self.term_to_id:
-                        self.term_to_id[term] = len(self.term_to_id)
-                        # Присваиваем термину уникальный индекс.
-                        self.idf_dict[term] = float(idf)
+                    if term not in term_idf:
+                        term_idf[term] = float(idf)
                         # Сохраняем IDF для термина как число с плавающей точкой.
 
-        # Теперь строим векторы документов
-        for filename in filenames:
+        # Индексы терминов — их позиции в отсортированном списке, как в TermDictionary
+        sorted_terms = sorted(term_idf)
+        self.term_to_id = {term: idx for idx, term in enumerate(sorted_terms)}
+        self.idf = [term_idf[term] for term in sorted_terms]
+
+        # Теперь строим векторы документов сразу в матрицу
+        self.doc_data = []
+        self.doc_matrix = np.zeros((len(filenames), len(self.term_to_id)))
+        for row, filename in enumerate(filenames):
             doc_id = int(filename.split(".")[0].split("_")[-1])
             # Извлекаем ID документа из имени файла.
-            doc_vector = np.zeros(len(self.term_to_id))
-            # Создаем нулевой вектор той же длины, что и количество уникальных терминов.
+            doc_vector = self.doc_matrix[row]
+            # Строка матрицы — вектор документа той же длины, что и количество уникальных терминов.
 
             with open(os.path.join(self.data_dir, filename), 'r', encoding='utf-8') as f:
                 for line in f:
@@ -45,23 +58,28 @@ class TFIDFVectorSearch:
                     doc_vector[term_idx] = float(tfidf)
                     # Заполняем вектор документа значениями TF-IDF для соответствующих терминов.
 
-            self.doc_data.append({
-                "doc_id": doc_id,
-                "vector": doc_vector.tolist()  # Преобразуем numpy array в список для сериализации.
-            })
+            self.doc_data.append({"doc_id": doc_id})
 
     def save_index(self):
         index_data = {
-            "doc_data": self.doc_data,
-            "term_to_id": self.term_to_id,
-            "idf_dict": self.idf_dict
+            "doc_ids": [doc["doc_id"] for doc in self.doc_data]
         }
-        # Собираем все данные в один словарь для сохранения.
+        # В JSON — только номера документов; сами векторы лежат в doc_vectors.npy.
 
         with open("index.json", 'w', encoding='utf-8') as f:
             json.dump(index_data, f, indent=4)
             # Сохраняем данные в JSON-файл с отступами для удобочитаемости.
 
+        np.save("doc_vectors.npy", self.get_doc_matrix())
+        # Отдельно сохраняем матрицу векторов: её можно открыть через mmap только для чтения,
+        # и несколько процессов сервера будут делить одни и те же страницы памяти.
+
+        build_term_dictionary(
+            ((term, self.idf[idx], [], None) for term, idx in self.term_to_id.items()),
+            "terms.dict"
+        )
+        # Словарь терминов и IDF сохраняем в компактном формате вместо JSON-словарей.
+
     def load_index(self, index_dir=os.getcwd()):
         index_dir = os.path.join(os.path.dirname(index_dir), "t_5_search")
         """Загружает индексы из JSON."""
@@ -69,11 +87,61 @@ class TFIDFVectorSearch:
             index_data = json.load(f)
             # Загружаем данные из JSON-файла.
 
-        self.doc_data = index_data["doc_data"]
-        self.term_to_id = index_data["term_to_id"]
-        self.idf_dict = index_data["idf_dict"]
+        if "doc_ids" in index_data:
+            self.doc_data = [{"doc_id": doc_id} for doc_id in index_data["doc_ids"]]
+        else:
+            # Индекс старого формата: векторы документов записаны списками прямо в JSON
+            self.doc_data = index_data["doc_data"]
         # Восстанавливаем данные из JSON в атрибуты класса.
 
+        dictionary_file = os.path.join(index_dir, "terms.dict")
+        if os.path.exists(dictionary_file):
+            self.term_to_id = TermDictionary(dictionary_file)
+            self.idf = self.term_to_id.idf
+            # Словарь терминов открывается через mmap; IDF — массив, параллельный индексам терминов.
+        else:
+            # Индекс старого формата: словари терминов и IDF лежат в JSON
+            self.term_to_id = index_data["term_to_id"]
+            self.idf = [0.0] * len(self.term_to_id)
+            for term, idx in self.term_to_id.items():
+                self.idf[idx] = index_data["idf_dict"].get(term, 0)
+
+        matrix_file = os.path.join(index_dir, "doc_vectors.npy")
+        if os.path.exists(matrix_file):
+            self.doc_matrix = np.load(matrix_file, mmap_mode="r")
+            # Матрица читается через mmap и не копируется в память процесса,
+            # поэтому она должна точно соответствовать документам и словарю терминов.
+            expected = (len(self.doc_data), len(self.term_to_id))
+            if self.doc_matrix.shape != expected:
+                raise ValueError(
+                    f"Матрица {matrix_file} имеет размер {self.doc_matrix.shape}, ожидается {expected}. "
+                    f"Перестройте индекс."
+                )
+        elif "doc_ids" in index_data:
+            raise FileNotFoundError(f"Не найдена матрица векторов документов: {matrix_file}")
+        else:
+            self.doc_matrix = None
+
+    def load_segments(self, index_dir=os.getcwd()):
+        """
+        Открывает сегментированный индекс (t_5_search/segments), который index_builder.py
+        дополняет новыми документами. Возвращает False, если индекс ещё не построен.
+        """
+        segments_dir = os.path.join(os.path.dirname(index_dir), "t_5_search", "segments")
+        if not os.path.exists(os.path.join(segments_dir, "manifest.json")):
+            return False
+        self.segments = SegmentedIndex(segments_dir)
+        return True
+
+    def get_doc_matrix(self):
+        """Возвращает матрицу векторов документов, строя её при первом обращении."""
+        if self.doc_matrix is None:
+            self.doc_matrix = np.array([doc["vector"] for doc in self.doc_data])
+            # Векторы старого формата больше не нужны: они уже в матрице
+            for doc in self.doc_data:
+                doc.pop("vector", None)
+        return self.doc_matrix
+
     def vectorize_query(self, query):
         """Преобразует запрос в TF-IDF вектор."""
         query_terms = query.lower().split()
@@ -90,10 +158,10 @@ class TFIDFVectorSearch:
         # Находим максимальную частоту термина в запросе (или используем 1, если запрос пустой).
 
         for term, tf in term_counts.items():
-            if term in self.term_to_id:
-                term_idx = self.term_to_id[term]
+            term_idx = self.term_to_id.get(term)
+            if term_idx is not None:
                 normalized_tf = 0.5 + 0.5 * (tf / max_tf)  # Сглаженный TF.
-                query_vector[term_idx] = normalized_tf * self.idf_dict.get(term, 0)
+                query_vector[term_idx] = normalized_tf * self.idf[term_idx]
                 # Вычисляем TF-IDF для термина и обновляем вектор запроса.
 
         return query_vector.reshape(1, -1)
@@ -101,11 +169,16 @@ class TFIDFVectorSearch:
 
     def search(self, query, top_k=5):
         """Ищет документы и возвращает топ-k результатов."""
+        if self.segments is not None:
+            # Сегменты, которые index_builder.py дописал при работающем поиске, видны без перезапуска
+            self.segments.refresh()
+            return self.segments.search(query, top_k=top_k)
+
         query_vector = self.vectorize_query(query)
         # Преобразуем запрос в TF-IDF вектор.
 
-        # Преобразуем списки векторов обратно в numpy array
-        doc_vectors = np.array([doc["vector"] for doc in self.doc_data])
+        # Берём готовую матрицу векторов вместо сборки numpy array на каждый запрос
+        doc_vectors = self.get_doc_matrix()
 
         similarities = cosine_similarity(query_vector, doc_vectors)
         # Вычисляем косинусное сходство между запросом и всеми документами.
@@ -143,7 +216,9 @@ def interactive_search(searcher):
 if __name__ == "__main__":
     searcher = TFIDFVectorSearch(data_dir="output_terms")
 
-    if os.path.exists("index.json"):
+    if searcher.load_segments():
+        print("Загружаем сегментированный индекс...")
+    elif os.path.exists("index.json"):
         print("Загружаем индекс из JSON...")
         searcher.load_index()
     else:
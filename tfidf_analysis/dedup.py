@@ -0,0 +1,144 @@
+import random
+import zlib
+from collections import defaultdict
+
+# Поиск почти-дубликатов документов (MinHash + LSH).
+#
+# Документ сравнивается по шинглам — последовательностям из SHINGLE_SIZE слов его текста
+# (текст берётся из прямого индекса). Шинглы, встречающиеся во многих документах
+# (навигация, подвал сайта), отбрасываются: иначе разные страницы одного сайта выглядят
+# почти одинаковыми. По множеству оставшихся шинглов считается MinHash-сигнатура.
+# Сигнатура делится на полосы (bands); документы, у которых совпала хотя бы одна полоса,
+# становятся кандидатами. Кандидаты проверяются точным коэффициентом Жаккара, и близкие
+# документы объединяются в кластеры. От каждого кластера индексируется только канонический
+# документ (с наименьшим номером), остальные записываются как его псевдонимы.
+
+NUM_PERM = 64  # Длина сигнатуры
+BANDS = 16  # Число полос; строк в полосе NUM_PERM // BANDS
+THRESHOLD = 0.9  # Минимальный коэффициент Жаккара для почти-дубликатов
+SHINGLE_SIZE = 5  # Число слов в шингле
+BOILERPLATE_FRACTION = 0.2  # Шинглы из большей доли документов считаются шаблоном сайта
+
+MERSENNE_PRIME = (1 << 61) - 1
+
+
+def make_permutations(num_perm=NUM_PERM, seed=1):
+    # Коэффициенты универсальных хеш-функций h(x) = (a * x + b) mod p
+    rng = random.Random(seed)
+    return [(rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME)) for _ in range(num_perm)]
+
+
+def minhash(tokens, permutations):
+    """MinHash-сигнатура множества строк (токенов или шинглов)."""
+    hashes = [zlib.crc32(token.encode("utf-8")) for token in set(tokens)]
+    if not hashes:
+        return (0,) * len(permutations)
+    return tuple(min([(a * h + b) % MERSENNE_PRIME for h in hashes]) for a, b in permutations)
+
+
+def shingles(words, size=SHINGLE_SIZE):
+    """Множество шинглов — подряд идущих size слов текста."""
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def drop_boilerplate(shingle_sets, fraction=BOILERPLATE_FRACTION):
+    """
+    Убирает шинглы, которые встречаются больше чем в fraction документов.
+    Если у документа не остаётся ни одного шингла, он сравнивается по всем своим шинглам.
+    """
+    doc_freq = defaultdict(int)
+    for items in shingle_sets.values():
+        for item in items:
+            doc_freq[item] += 1
+    limit = max(2, fraction * len(shingle_sets))
+    result = {}
+    for doc_id, items in shingle_sets.items():
+        content = {item for item in items if doc_freq[item] <= limit}
+        result[doc_id] = content or items
+    return result
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def find_duplicates(documents, threshold=THRESHOLD, num_perm=NUM_PERM, bands=BANDS):
+    """
+    Находит кластеры почти-дубликатов.
+    documents — словарь {doc_id: список слов текста в порядке следования}.
+    Возвращает словарь псевдонимов {doc_id дубликата: doc_id канонического документа}.
+    """
+    permutations = make_permutations(num_perm)
+    rows = num_perm // bands
+    shingle_sets = drop_boilerplate({doc_id: shingles(words) for doc_id, words in documents.items()})
+
+    # Раскладываем документы по корзинам: ключ — номер полосы и её значения
+    buckets = defaultdict(list)
+    for doc_id, items in shingle_sets.items():
+        signature = minhash(items, permutations)
+        for band in range(bands):
+            buckets[(band, signature[band * rows:(band + 1) * rows])].append(doc_id)
+
+    # Пары кандидатов: документы, совпавшие хотя бы в одной полосе
+    candidates = defaultdict(set)
+    for bucket in buckets.values():
+        for i, left in enumerate(bucket):
+            for right in bucket[i + 1:]:
+                candidates[left].add(right)
+                candidates[right].add(left)
+
+    # Кластеризация вокруг лидера: документы просматриваются по возрастанию номера, первый
+    # ещё не распределённый документ становится каноническим, и к нему присоединяются только
+    # кандидаты, близкие именно к нему. Цепочки A~B~C не склеиваются, поэтому каждый
+    # отброшенный документ похож на свой канонический не меньше чем на threshold.
+    aliases = {}
+    for leader in sorted(shingle_sets):
+        if leader in aliases:
+            continue
+        for doc_id in sorted(candidates[leader]):
+            if doc_id < leader or doc_id in aliases:
+                continue
+            if jaccard(shingle_sets[leader], shingle_sets[doc_id]) >= threshold:
+                aliases[doc_id] = leader
+
+    return aliases
+
+
+def report(documents, aliases):
+    """Печатает долю дубликатов и экономию на размере индекса."""
+    total_docs = len(documents)
+    if not total_docs:
+        print("Документов нет")
+        return
+    total_postings = sum(len(set(tokens)) for tokens in documents.values())
+    removed_postings = sum(len(set(documents[doc_id])) for doc_id in aliases)
+    clusters = len(set(aliases.values()))
+
+    print(f"Документов: {total_docs}, дубликатов: {len(aliases)} в {clusters} кластерах "
+          f"({len(aliases) / total_docs:.1%})")
+    if total_postings:
+        print(f"Постингов в индексе: {total_postings} -> {total_postings - removed_postings} "
+              f"(-{removed_postings / total_postings:.1%})")
+    # Время запроса по индексу с дубликатами и без них замеряет dedup_benchmark.py
+    print(f"Документов для поиска: {total_docs} -> {total_docs - len(aliases)}")
+
+
+def save_aliases(aliases, path):
+    # Каждая строка: номер документа-дубликата и номер канонического документа
+    with open(path, "w", encoding="utf-8") as f:
+        for doc_id in sorted(aliases):
+            f.write(f"{doc_id} {aliases[doc_id]}\n")
+
+
+def load_aliases(path):
+    aliases = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 2:
+                aliases[int(parts[0])] = int(parts[1])
+    return aliases
@@ -0,0 +1,64 @@
+import os
+import sys
+import tempfile
+import time
+
+from program import TOKENS_DIR, DUPLICATES_FILE, get_files, extract_number, process_documents, get_duplicates
+from dedup import load_aliases
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from t_5_search.searcher import TFIDFVectorSearch
+
+# Замер времени векторного поиска по индексу с дубликатами и без них.
+# Запуск из корня репозитория: python tfidf_analysis/dedup_benchmark.py
+
+QUERIES = [
+    "собака", "щенок", "корм", "порода собак", "здоровье собаки",
+    "прививки щенку", "уход за шерстью", "дрессировка", "ветеринар", "питание",
+]
+REPEATS = 200
+
+
+def build_searcher(token_files, output_dir):
+    """Считает TF-IDF по токенам документов и загружает по нему векторный поиск."""
+    process_documents(
+        [(path, None) for path in token_files],
+        map_func=lambda tokens, _: tokens,
+        output_dir=output_dir,
+        filename_prefix="tfidf_terms"
+    )
+    searcher = TFIDFVectorSearch(data_dir=output_dir)
+    searcher.load_data()
+    return searcher
+
+
+def time_search(searcher, queries=QUERIES, repeats=REPEATS):
+    """Среднее время одного запроса в миллисекундах."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for query in queries:
+            searcher.search(query, top_k=10)
+    return (time.perf_counter() - start) * 1000 / (repeats * len(queries))
+
+
+def benchmark():
+    token_files = get_files(TOKENS_DIR, 'tokens_')
+    if os.path.exists(DUPLICATES_FILE):
+        aliases = load_aliases(DUPLICATES_FILE)
+    else:
+        aliases = get_duplicates()
+    unique_files = [path for path in token_files if extract_number(os.path.basename(path)) not in aliases]
+
+    with tempfile.TemporaryDirectory() as full_dir, tempfile.TemporaryDirectory() as dedup_dir:
+        for name, files, output_dir in (
+            ("Без удаления дубликатов", token_files, full_dir),
+            ("С удалением дубликатов", unique_files, dedup_dir),
+        ):
+            searcher = build_searcher(files, output_dir)
+            rows, columns = searcher.doc_matrix.shape
+            print(f"{name}: матрица {rows} x {columns}, "
+                  f"{time_search(searcher):.3f} мс на запрос")
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -1,8 +1,14 @@
 # Импорт необходимых модулей
 import os
+import sys
 import math
 from collections import Counter
 
+from dedup import find_duplicates, report, save_aliases
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tokenization_lemmatization.forward_store import ForwardStore, STORE_FILE
+
 # Пути к директориям с токенами и леммами
 TOKENS_DIR = './tokenization_lemmatization/tokens'
 LEMMAS_DIR = './tokenization_lemmatization/lemmas'
@@ -11,6 +17,9 @@ LEMMAS_DIR = './tokenization_lemmatization/lemmas'
 OUTPUT_TERMS_DIR = 'tfidf_analysis/output_terms'
 OUTPUT_LEMMAS_DIR = 'tfidf_analysis/output_lemmas'
 
+# Файл с псевдонимами почти-дубликатов: "номер дубликата номер канонического документа"
+DUPLICATES_FILE = 'tfidf_analysis/duplicates.txt'
+
 # Создание выходных директорий, если они не существуют
 os.makedirs(OUTPUT_TERMS_DIR, exist_ok=True)
 os.makedirs(OUTPUT_LEMMAS_DIR, exist_ok=True)
@@ -37,14 +46,16 @@ def read_file_lemmas(path):
     return lemma_dict
 
 
+# Номер документа из имени файла
+def extract_number(filename):
+    try:
+        return int(''.join(filter(str.isdigit, filename)))
+    except ValueError:
+        return float('inf')  # если чисел нет — помещаем в конец
+
+
 # Получение отсортированного списка файлов с нужным префиксом
 def get_files(directory, prefix):
-    def extract_number(filename):
-        try:
-            return int(''.join(filter(str.isdigit, filename)))
-        except ValueError:
-            return float('inf')  # если чисел нет — помещаем в конец
-
     return sorted(
         [
             os.path.join(directory, fname)
@@ -85,26 +96,61 @@ def save_tfidf(path, tf_dict, idf_dict):
 def process_documents(file_pairs, map_func, output_dir, filename_prefix):
     all_mapped_lists = []
 
+    doc_ids = []
+
     for token_path, lemma_path in file_pairs:
         tokens = read_file_tokens(token_path)
         mapped = map_func(tokens, lemma_path)
         all_mapped_lists.append(mapped)
+        doc_ids.append(extract_number(os.path.basename(token_path)))
 
     vocab = sorted(set(term for doc in all_mapped_lists for term in doc))
     idf_dict = compute_idf(vocab, all_mapped_lists)
 
-    for idx, mapped in enumerate(all_mapped_lists, start=1):
+    # Удаляем результаты прошлых запусков: среди них могут быть файлы документов,
+    # которые теперь считаются дубликатами, а поиск читает все файлы с этим префиксом
+    for fname in os.listdir(output_dir):
+        if fname.startswith(f"{filename_prefix}_") and fname.endswith('.txt'):
+            os.remove(os.path.join(output_dir, fname))
+
+    # Файлы называем по номеру исходного документа: после удаления дубликатов номера идут с пропусками
+    for doc_id, mapped in zip(doc_ids, all_mapped_lists):
         tf_dict = compute_tf(mapped)
         save_tfidf(
-            os.path.join(output_dir, f"{filename_prefix}_{idx}.txt"),
+            os.path.join(output_dir, f"{filename_prefix}_{doc_id}.txt"),
             tf_dict, idf_dict
         )
 
 
+# Поиск почти-дубликатов по тексту страниц: индексируется только один документ из каждого кластера.
+# Файлы токенов для этого не годятся — это отсортированные списки уникальных слов,
+# в которых преобладают общие для всего сайта меню и подвал.
+def get_duplicates():
+    token_files = get_files(TOKENS_DIR, 'tokens_')
+    documents = {
+        extract_number(os.path.basename(path)): read_file_tokens(path)
+        for path in token_files
+    }
+    if not os.path.exists(STORE_FILE):
+        print(f"Прямой индекс {STORE_FILE} не найден, дубликаты не ищутся. "
+              f"Запустите tokenization_lemmatization/program.py, чтобы его построить.")
+        aliases = {}
+    else:
+        store = ForwardStore(STORE_FILE)
+        aliases = find_duplicates({doc_id: store.words(doc_id) for doc_id in documents if doc_id in store})
+        store.close()
+        report(documents, aliases)
+    save_aliases(aliases, DUPLICATES_FILE)
+    return aliases
+
+
 # Обработка токенов
-def get_terms():
+def get_terms(aliases):
     token_files = get_files(TOKENS_DIR, 'tokens_')
-    file_pairs = [(path, None) for path in token_files]
+    file_pairs = [
+        (path, None) for path in token_files
+        if extract_number(os.path.basename(path)) not in aliases
+    ]
 
     def identity(tokens, _):
         return tokens
@@ -118,10 +164,13 @@ def get_terms():
 
 
 # Обработка документов с лемматизацией
-def get_lemmas():
+def get_lemmas(aliases):
     token_files = get_files(TOKENS_DIR, 'tokens_')
     lemma_files = get_files(LEMMAS_DIR, 'lemmas_')
-    file_pairs = list(zip(token_files, lemma_files))
+    file_pairs = [
+        (token_path, lemma_path) for token_path, lemma_path in zip(token_files, lemma_files)
+        if extract_number(os.path.basename(token_path)) not in aliases
+    ]
 
     def map_to_lemmas(tokens, lemma_path):
         lemma_map = read_file_lemmas(lemma_path)
@@ -135,10 +184,11 @@ def get_lemmas():
     )
 
 
-# Основная функция запуска: считает TF-IDF для токенов и лемм
+# Основная функция запуска: отбрасывает почти-дубликаты и считает TF-IDF для токенов и лемм
 def main():
-    get_terms()
-    get_lemmas()
+    aliases = get_duplicates()
+    get_terms(aliases)
+    get_lemmas(aliases)
     print("TF-IDF успешно посчитан для всех документов.")
 
 
@@ -0,0 +1,183 @@
+import html
+import mmap
+import os
+import re
+import struct
+from array import array
+from bisect import bisect_left
+
+# Прямой индекс: для каждого документа хранится очищенный текст и смещения его токенов.
+# Файл читается через mmap, поэтому для сниппетов не нужно заново открывать и парсить HTML.
+#
+# Формат файла (little-endian):
+#   заголовок  — MAGIC, версия, число документов
+#   таблица    — по записи на документ: doc_id, число токенов, длина текста в байтах,
+#                смещение текста, смещение массивов токенов
+#   данные     — текст в UTF-8, затем массив начал и массив концов токенов (uint32,
+#                смещения в символах декодированного текста)
+
+MAGIC = b"FWD1"
+VERSION = 1
+HEADER = struct.Struct("<4sII")
+RECORD = struct.Struct("<IIIQQ")
+
+TOKEN_RE = re.compile(r"\w+")
+
+# Единственное место хранения прямого индекса: его пишет токенизация и читает демо
+STORE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "forward_store.bin")
+
+
+def build_forward_store(documents, output_file=STORE_FILE):
+    """
+    Строит прямой индекс из пар (doc_id, text) и сохраняет его в файл.
+    """
+    entries = []
+    for doc_id, text in sorted(documents, key=lambda item: item[0]):
+        # Схлопываем пробелы, чтобы текст сниппета был компактным
+        text = " ".join(text.split())
+        starts = array("I")
+        ends = array("I")
+        for match in TOKEN_RE.finditer(text):
+            starts.append(match.start())
+            ends.append(match.end())
+        entries.append((doc_id, text.encode("utf-8"), starts, ends))
+
+    with open(output_file, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(entries)))
+
+        offset = HEADER.size + RECORD.size * len(entries)
+        for doc_id, data, starts, ends in entries:
+            tokens_offset = offset + len(data)
+            # Выравниваем массивы токенов по 4 байта
+            tokens_offset += -tokens_offset % 4
+            f.write(RECORD.pack(doc_id, len(starts), len(data), offset, tokens_offset))
+            offset = tokens_offset + 8 * len(starts)
+
+        for doc_id, data, starts, ends in entries:
+            f.write(data)
+            f.write(b"\0" * (-f.tell() % 4))
+            f.write(starts.tobytes())
+            f.write(ends.tobytes())
+
+    return len(entries)
+
+
+class ForwardStore:
+    def __init__(self, filename=STORE_FILE):
+        # Открываем файл и отображаем его в память только для чтения.
+        self._file = open(filename, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mm)
+
+        magic, version, count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Неизвестный формат прямого индекса: {filename}")
+
+        # Таблица смещений: doc_id -> (число токенов, длина текста, смещение текста, смещение токенов)
+        self.offsets = {}
+        for i in range(count):
+            doc_id, *record = RECORD.unpack_from(self._mm, HEADER.size + i * RECORD.size)
+            self.offsets[doc_id] = record
+
+    def close(self):
+        self._view.release()
+        self._mm.close()
+        self._file.close()
+
+    def __contains__(self, doc_id):
+        return doc_id in self.offsets
+
+    def document(self, doc_id):
+        """Возвращает текст документа и массивы начал и концов его токенов."""
+        n_tokens, text_len, text_offset, tokens_offset = self.offsets[doc_id]
+        text = str(self._mm[text_offset:text_offset + text_len], "utf-8")
+        starts = self._view[tokens_offset:tokens_offset + 4 * n_tokens].cast("I")
+        ends = self._view[tokens_offset + 4 * n_tokens:tokens_offset + 8 * n_tokens].cast("I")
+        return text, starts, ends
+
+    def words(self, doc_id):
+        """Слова документа в нижнем регистре в порядке следования в тексте."""
+        text, starts, ends = self.document(doc_id)
+        return [text[start:end].lower() for start, end in zip(starts, ends)]
+
+    def find_hits(self, text, starts, ends, terms, max_hits=100):
+        """
+        Находит номера токенов документа, совпадающих с терминами запроса.
+        Для каждого термина учитываются только первые max_hits вхождений,
+        чтобы время построения сниппета не зависело от длины документа.
+        """
+        lowered = text.lower()
+        hits = []
+        if len(lowered) != len(text):
+            # Редкий случай: lower() изменил длину строки, сравниваем токены по одному
+            for i in range(len(starts)):
+                if text[starts[i]:ends[i]].lower() in terms:
+                    hits.append(i)
+            return hits
+
+        for term in terms:
+            found = 0
+            pos = lowered.find(term)
+            while pos != -1 and found < max_hits:
+                # Совпадение засчитывается, только если оно целиком покрывает токен
+                i = bisect_left(starts, pos)
+                if i < len(starts) and starts[i] == pos and ends[i] == pos + len(term):
+                    hits.append(i)
+                    found += 1
+                pos = lowered.find(term, pos + 1)
+        hits.sort()
+        return hits
+
+    def best_window(self, hits, tokens, window):
+        """Выбирает окно из window токенов с наибольшим числом разных терминов запроса."""
+        best_start, best_score = 0, (0, 0)
+        counts = {}  # Сколько раз каждый термин встречается в текущем окне
+        left = 0
+        for right in range(len(hits)):
+            term = tokens[hits[right]]
+            counts[term] = counts.get(term, 0) + 1
+            while hits[right] - hits[left] >= window:
+                term = tokens[hits[left]]
+                counts[term] -= 1
+                if not counts[term]:
+                    del counts[term]
+                left += 1
+            score = (len(counts), right - left + 1)
+            if score > best_score:
+                best_start, best_score = hits[left], score
+        return best_start
+
+    def snippet(self, doc_id, query, window=30, context=5):
+        """
+        Возвращает HTML-сниппет документа с выделенными терминами запроса.
+        Если документа нет в индексе, возвращает пустую строку.
+        """
+        if doc_id not in self.offsets:
+            return ""
+        text, starts, ends = self.document(doc_id)
+        if not starts:
+            return ""
+
+        terms = {term for term in query.lower().split() if term}
+        hits = self.find_hits(text, starts, ends, terms)
+        if hits:
+            tokens = {i: text[starts[i]:ends[i]].lower() for i in hits}
+            first = max(0, self.best_window(hits, tokens, window) - context)
+        else:
+            first = 0
+        last = min(len(starts), first + window + context) - 1
+
+        # Собираем сниппет, экранируя текст и выделяя совпадения
+        parts = ["… " if first > 0 else ""]
+        pos = starts[first]
+        hit_index = bisect_left(hits, first)
+        while hit_index < len(hits) and hits[hit_index] <= last:
+            i = hits[hit_index]
+            parts.append(html.escape(text[pos:starts[i]]))
+            parts.append(f"<b>{html.escape(text[starts[i]:ends[i]])}</b>")
+            pos = ends[i]
+            hit_index += 1
+        parts.append(html.escape(text[pos:ends[last]]))
+        if last < len(starts) - 1:
+            parts.append(" …")
+        return "".join(parts)
@@ -5,6 +5,8 @@ import pymorphy2
 import nltk
 from nltk.corpus import stopwords
 
+from forward_store import build_forward_store, STORE_FILE
+
 
 def extract_text_from_html(file_path):
     with open(file_path, 'r', encoding='utf-8') as file:
@@ -12,6 +14,15 @@ def extract_text_from_html(file_path):
         return soup.get_text(separator=' ')
 
 
+def extract_plain_text(file_path):
+    # Текст для прямого индекса: без скриптов и стилей, чтобы он годился для сниппетов
+    with open(file_path, 'r', encoding='utf-8') as file:
+        soup = BeautifulSoup(file, 'html.parser')
+    for tag in soup(['script', 'style', 'noscript']):
+        tag.decompose()
+    return soup.get_text(separator=' ')
+
+
 def tokenize(text):
     # Извлекаем слова, приводим к нижнему регистру и исключаем стоп-слова
     tokens = re.findall(r'\b[а-яА-ЯёЁ]+\b', text.lower())
@@ -47,6 +58,9 @@ def process_file(file_name):
             forms_str = ' '.join(sorted(forms))
             lemma_file.write(f'{lemma}: {forms_str}\n')
 
+    # Возвращаем номер документа и его текст для прямого индекса
+    return int(os.path.splitext(file_name)[0]), extract_plain_text(file_path)
+
 
 if __name__ == '__main__':
     # Скачиваем стоп-слова для русского языка
@@ -66,7 +80,11 @@ if __name__ == '__main__':
     html_dir = 'uploading_dog_themed_pages/pages'
 
     html_files = [f for f in os.listdir(html_dir) if f.endswith('.html')]
+    documents = []
     for html_file in html_files:
-        process_file(html_file)
+        documents.append(process_file(html_file))
+
+    # Строим прямой индекс для сниппетов в поисковой выдаче
+    build_forward_store(documents, STORE_FILE)
 
     print('Обработка завершена!')
@@ -0,0 +1,227 @@
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import struct
+from urllib.parse import urlsplit, urlunsplit, unquote_plus
+
+# Фронтир краулера: канонизация URL, фильтр Блума для уже виденных ссылок
+# и очередь ссылок на диске (SQLite) с контрольными точками для продолжения обхода.
+
+# Параметры, которые не меняют содержимое страницы (метки рекламных кампаний и т. п.)
+TRACKING_PARAMS = {
+    "yclid", "gclid", "fbclid", "etext", "ysclid", "_openstat", "openstat",
+}
+TRACKING_PREFIXES = ("utm_",)
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def canonicalize_url(url):
+    """
+    Приводит URL к каноническому виду: схема и хост в нижнем регистре, без порта по умолчанию,
+    без фрагмента и параметров отслеживания, параметры запроса отсортированы.
+    Канонический вид — только ключ для фильтра виденных ссылок; загружается исходный URL.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower().rstrip(".")
+    if ":" in host:
+        # IPv6-адрес: hostname возвращает его без квадратных скобок
+        host = f"[{host}]"
+
+    netloc = host
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{host}:{parts.port}"
+    if "@" in parts.netloc:
+        # Данные пользователя сохраняем как есть: от них может зависеть содержимое
+        netloc = parts.netloc.rsplit("@", 1)[0] + "@" + netloc
+
+    path = parts.path or "/"
+    while "//" in path:
+        path = path.replace("//", "/")
+
+    # Параметры сортируем в исходной записи, чтобы не превращать "?flag" в "?flag="
+    # и не менять кодировку значений
+    query = []
+    for pair in parts.query.split("&"):
+        if not pair:
+            continue
+        key = unquote_plus(pair.split("=", 1)[0]).lower()
+        if key not in TRACKING_PARAMS and not key.startswith(TRACKING_PREFIXES):
+            query.append(pair)
+    query.sort()
+
+    return urlunsplit((scheme, netloc, path, "&".join(query), ""))
+
+
+class BloomFilter:
+    """Фильтр Блума фиксированной ёмкости с заданной вероятностью ложного срабатывания."""
+
+    def __init__(self, capacity, error_rate, bits=None):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        # Оптимальные размер битового массива и число хеш-функций
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bits if bits is not None else bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # Двойное хеширование: k позиций из двух 64-битных половин одного хеша
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = struct.unpack("<QQ", digest)
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def __contains__(self, item):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+
+class ScalableBloomFilter:
+    """
+    Масштабируемый фильтр Блума: когда текущий фильтр заполнен, добавляется новый,
+    вдвое большей ёмкости и с более строгой вероятностью ошибки. Общая вероятность
+    ложного срабатывания остаётся не больше error_rate при любом числе элементов.
+    """
+
+    GROWTH = 2
+    TIGHTENING = 0.5
+
+    def __init__(self, initial_capacity=100000, error_rate=0.001):
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        self.filters = []
+
+    def __contains__(self, item):
+        return any(item in f for f in self.filters)
+
+    def __len__(self):
+        return sum(f.count for f in self.filters)
+
+    def add(self, item):
+        if not self.filters or self.filters[-1].count >= self.filters[-1].capacity:
+            n = len(self.filters)
+            self.filters.append(BloomFilter(
+                self.initial_capacity * self.GROWTH ** n,
+                self.error_rate * (1 - self.TIGHTENING) * self.TIGHTENING ** n
+            ))
+        self.filters[-1].add(item)
+
+    def save(self, path):
+        # Пишем во временный файл и переименовываем, чтобы сбой не оставил битый файл
+        with open(path + ".tmp", "wb") as f:
+            f.write(struct.pack("<QdI", self.initial_capacity, self.error_rate, len(self.filters)))
+            for bloom in self.filters:
+                f.write(struct.pack("<QdQQ", bloom.capacity, bloom.error_rate, bloom.count, len(bloom.bits)))
+                f.write(bloom.bits)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            initial_capacity, error_rate, n = struct.unpack("<QdI", f.read(struct.calcsize("<QdI")))
+            scalable = cls(initial_capacity, error_rate)
+            for _ in range(n):
+                capacity, rate, count, size = struct.unpack("<QdQQ", f.read(struct.calcsize("<QdQQ")))
+                bloom = BloomFilter(capacity, rate, bytearray(f.read(size)))
+                bloom.count = count
+                scalable.filters.append(bloom)
+        return scalable
+
+
+class DiskQueue:
+    """Приоритетная очередь ссылок в SQLite: в памяти не держится, переживает перезапуск."""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS frontier ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, url TEXT NOT NULL, "
+            "priority INTEGER NOT NULL, depth INTEGER NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS frontier_order ON frontier (priority, id)")
+
+    def push(self, url, priority, depth):
+        self.conn.execute(
+            "INSERT INTO frontier (url, priority, depth) VALUES (?, ?, ?)", (url, priority, depth)
+        )
+
+    def pop(self):
+        row = self.conn.execute(
+            "SELECT id, url, depth FROM frontier ORDER BY priority, id LIMIT 1"
+        ).fetchone()
+        if row is None:
+            return None
+        self.conn.execute("DELETE FROM frontier WHERE id = ?", (row[0],))
+        return row[1], row[2]
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM frontier").fetchone()[0]
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+class Frontier:
+    """
+    Фронтир обхода: канонизирует ссылки, отбрасывает уже виденные и выдаёт следующие
+    в порядке приоритета (по умолчанию — по глубине, то есть обход в ширину).
+
+    Все изменения очереди фиксируются только в контрольной точке (checkpoint). После сбоя
+    обход продолжается с последней контрольной точки: ссылки, выданные после неё,
+    будут выданы снова.
+    """
+
+    def __init__(self, state_dir="crawl_state", error_rate=0.001, initial_capacity=100000):
+        os.makedirs(state_dir, exist_ok=True)
+        self.bloom_path = os.path.join(state_dir, "seen.bloom")
+        self.state_path = os.path.join(state_dir, "state.json")
+        self.queue = DiskQueue(os.path.join(state_dir, "queue.sqlite"))
+
+        if os.path.exists(self.bloom_path):
+            self.seen = ScalableBloomFilter.load(self.bloom_path)
+        else:
+            self.seen = ScalableBloomFilter(initial_capacity, error_rate)
+
+    def load_state(self):
+        """Возвращает состояние краулера, сохранённое в последней контрольной точке."""
+        if not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def add(self, url, depth=0, priority=None):
+        """
+        Добавляет ссылку в очередь. Возвращает False, если ссылка уже встречалась.
+        Виденные ссылки сравниваются по каноническому виду, а в очередь попадает исходный URL.
+        """
+        key = canonicalize_url(url)
+        if key in self.seen:
+            return False
+        self.seen.add(key)
+        self.queue.push(url, depth if priority is None else priority, depth)
+        return True
+
+    def pop(self):
+        """Возвращает следующую пару (url, глубина) или None, если очередь пуста."""
+        return self.queue.pop()
+
+    def checkpoint(self, state):
+        """Сохраняет очередь, фильтр виденных ссылок и состояние краулера."""
+        self.queue.commit()
+        self.seen.save(self.bloom_path)
+        with open(self.state_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(self.state_path + ".tmp", self.state_path)
+
+    def close(self):
+        self.queue.close()
@@ -1,9 +1,13 @@
 
 import os
+import sys
+import shutil
 import requests
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
 
+from frontier import Frontier
+
 # Начальная страница для обхода
 start_url = "https://www.purinaone.ru/dog/articles"
 second_url = "https://petstory.ru/product-finder/?utm_source=yandex_gm&utm_medium=cpc&utm_campaign=ProductFinder_conv_all_108466900&utm_content=5418269796_15938525792&utm_term=---autotargeting&etext=2202.hsJ1eYzFtr9p77DjrdZFTEdGBCckOKVNMWwGmFGk3WJkZ2R0c3pqYXRuYXFqZHFh.b9866caf52461dde7f986842106823a9c8521141&yclid=18380041850861387775"
@@ -15,8 +19,11 @@ os.makedirs(output_dir, exist_ok=True)
 # Файл для записи индекса
 index_file = "index.txt"
 
-# Множество для хранения посещенных ссылок
-visited_urls = set()
+# Папка для состояния обхода (очередь ссылок, фильтр виденных ссылок, контрольные точки)
+state_dir = "crawl_state"
+
+# Как часто (в сохранённых страницах) делать контрольную точку
+checkpoint_every = 10
 
 # Счетчик для имен файлов
 file_counter = 1
@@ -61,44 +68,88 @@ def extract_links(url, html_content):
     return links
 
 
-def crawl(url, max_pages=100):
+def crawl(frontier, max_pages=100):
     """
-    Рекурсивно обходит сайт, начиная с заданного URL.
+    Обходит сайт в ширину, беря ссылки из фронтира, пока не будет сохранено max_pages страниц.
+    Периодически сохраняет контрольную точку, чтобы обход можно было продолжить после сбоя.
     """
-    global visited_urls
+    global file_counter
 
-    if len(visited_urls) >= max_pages:
+    while file_counter - 1 < max_pages:
+        item = frontier.pop()
+        if item is None:
+            print("Очередь ссылок пуста.")
+            break
+        url, depth = item
+
+        try:
+            print(f"Загружаю: {url}")
+            response = requests.get(url)
+            response.raise_for_status()  # Проверяем на ошибки HTTP
+        except requests.RequestException as e:
+            print(f"Ошибка при загрузке {url}: {e}")
+            continue
+
+        # Сохраняем страницу
+        save_page(url, response.text)
+
+        # Извлекаем ссылки и добавляем новые во фронтир (уже виденные он отбросит сам)
+        for link in extract_links(url, response.text):
+            frontier.add(link, depth + 1)
+
+        if (file_counter - 1) % checkpoint_every == 0:
+            checkpoint(frontier)
+    else:
         print("Достигнут лимит страниц.")
-        return
 
-    if url in visited_urls:
-        return
+    checkpoint(frontier)
 
-    try:
-        print(f"Загружаю: {url}")
-        response = requests.get(url)
-        response.raise_for_status()  # Проверяем на ошибки HTTP
 
-        # Сохраняем страницу
-        save_page(url, response.text)
-        visited_urls.add(url)
+def checkpoint(frontier):
+    """
+    Сохраняет состояние обхода: номер следующего файла и размер индекса,
+    чтобы при продолжении обрезать строки, записанные после контрольной точки.
+    """
+    frontier.checkpoint({
+        "file_counter": file_counter,
+        "index_size": os.path.getsize(index_file),
+    })
 
-        # Извлекаем ссылки
-        links = extract_links(url, response.text)
 
-        # Рекурсивно обходим новые ссылки
-        for link in links:
-            if link not in visited_urls and len(visited_urls) < max_pages:
-                crawl(link, max_pages)
+def restore(frontier):
+    """
+    Восстанавливает состояние краулера из последней контрольной точки.
+    """
+    global file_counter
 
-    except requests.RequestException as e:
-        print(f"Ошибка при загрузке {url}: {e}")
+    state = frontier.load_state()
+    file_counter = state.get("file_counter", 1)
+    with open(index_file, "a", encoding="utf-8") as index:
+        index.truncate(state.get("index_size", 0))
+    print(f"Продолжаем обход со страницы {file_counter}, в очереди {len(frontier.queue)} ссылок")
 
 
 if __name__ == "__main__":
-    # Очищаем файл индекса перед началом работы
-    open(index_file, "w").close()
+    # python program.py --resume — продолжить обход с последней контрольной точки
+    resume = "--resume" in sys.argv and os.path.exists(state_dir)
+
+    if not resume:
+        # Очищаем файл индекса и состояние обхода перед началом работы
+        open(index_file, "w").close()
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+    frontier = Frontier(state_dir)
+    if resume:
+        restore(frontier)
+    else:
+        frontier.add(start_url)
+        frontier.add(second_url)
+        # Сохраняем начальные ссылки сразу, чтобы сбой до первой контрольной точки
+        # не оставил пустую очередь при --resume
+        checkpoint(frontier)
 
     # Запускаем краулер
-    crawl(start_url, max_pages=100)
-    crawl(second_url, max_pages=100)
\ No newline at end of file
+    try:
+        crawl(frontier, max_pages=100)
+    finally:
+        frontier.close()